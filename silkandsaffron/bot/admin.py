@@ -1,4 +1,5 @@
 from django.contrib import admin
+from .caching import bump_content_version
 from .models import PageContent
 
 @admin.register(PageContent)
@@ -27,10 +28,21 @@ class PageContentAdmin(admin.ModelAdmin):
     
     def mark_inactive(self, request, queryset):
         queryset.update(is_active=False)
+        bump_content_version()
         self.message_user(request, f"{queryset.count()} pages marked inactive")
     mark_inactive.short_description = "Mark selected as inactive"
     
     def mark_active(self, request, queryset):
         queryset.update(is_active=True)
+        bump_content_version()
         self.message_user(request, f"{queryset.count()} pages marked active")
-    mark_active.short_description = "Mark selected as active"
\ No newline at end of file
+    mark_active.short_description = "Mark selected as active"
+    
+    # Deletes send no cache signal, so invalidate once per delete
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        bump_content_version()
+    
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        bump_content_version()
\ No newline at end of file
@@ -0,0 +1,44 @@
+import time
+from collections import deque
+
+from django.core.cache import cache
+
+# Bumped whenever PageContent changes; cached corpora are keyed on it
+CONTENT_VERSION_KEY = "pagecontent:v"
+
+SCRAPED_CONTENT_TIMEOUT = 900
+LAST_SUGGESTED_TIMEOUT = 1800
+LAST_SUGGESTED_LIMIT = 10
+
+
+def _new_version():
+    # Time-based rather than a counter, so a culled or lost version key never
+    # comes back as an old number still keying a stale corpus
+    return time.time_ns()
+
+
+def content_version():
+    """Current PageContent version token"""
+    return cache.get_or_set(CONTENT_VERSION_KEY, _new_version, None)
+
+
+def bump_content_version():
+    """Invalidate every cache entry derived from PageContent"""
+    # Set with no timeout (cache.incr() on backends without a native incr
+    # re-sets the key with the default 300s expiry), and never reuse the
+    # current token even if the clock has not ticked since
+    version = max(_new_version(), (cache.get(CONTENT_VERSION_KEY) or 0) + 1)
+    cache.set(CONTENT_VERSION_KEY, version, None)
+
+
+def scraped_content_key():
+    return f"scraped_content:{content_version()}"
+
+
+def get_last_suggested(session_id):
+    """Bounded deque of URLs recently suggested in this Dialogflow session, oldest first"""
+    return deque(cache.get(f"last_suggested:{session_id}", ()), maxlen=LAST_SUGGESTED_LIMIT)
+
+
+def set_last_suggested(session_id, urls):
+    cache.set(f"last_suggested:{session_id}", list(urls), LAST_SUGGESTED_TIMEOUT)
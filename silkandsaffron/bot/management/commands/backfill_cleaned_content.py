@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from bot.caching import bump_content_version
+from bot.models import PageContent
+
+BATCH_SIZE = 500
+
+class Command(BaseCommand):
+    help = "Populate cleaned_content, price_numeric and content_hash for existing PageContent entries"
+
+    def handle(self, *args, **options):
+        self.stdout.write("🧹 Backfilling cleaned content...\n")
+        
+        updated_count = 0
+        batch = []
+        
+        pages = PageContent.objects.only('id', 'title', 'content', 'page_type').iterator(chunk_size=BATCH_SIZE)
+        for page in pages:
+            page.refresh_derived_fields()
+            batch.append(page)
+            
+            if len(batch) >= BATCH_SIZE:
+                PageContent.objects.bulk_update(batch, PageContent.DERIVED_FIELDS)
+                updated_count += len(batch)
+                batch = []
+        
+        if batch:
+            PageContent.objects.bulk_update(batch, PageContent.DERIVED_FIELDS)
+            updated_count += len(batch)
+        
+        # bulk_update skips post_save, so invalidate cached content explicitly
+        bump_content_version()
+        
+        self.stdout.write("="*60)
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Backfilled {updated_count} pages!")
+        )
+        self.stdout.write("="*60)
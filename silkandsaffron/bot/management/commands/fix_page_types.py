@@ -1,4 +1,6 @@
 from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+from bot.caching import bump_content_version
 from bot.models import PageContent
 
 class Command(BaseCommand):
@@ -7,41 +9,34 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         self.stdout.write("🔧 Fixing page types...\n")
         
-        # Get all pages
-        all_pages = PageContent.objects.all()
-        total = all_pages.count()
+        # Classify by URL pattern directly in the database (one UPDATE per type)
+        is_product = Q(url__contains='/products/')
+        is_collection = Q(url__contains='/collections/') & ~is_product
+        is_page = ~is_product & ~Q(url__contains='/collections/')
         
-        updated_count = 0
-        product_count = 0
-        collection_count = 0
-        page_count = 0
+        updated_count = (
+            PageContent.objects.filter(is_product).exclude(page_type='product').update(page_type='product')
+            + PageContent.objects.filter(is_collection).exclude(page_type='collection').update(page_type='collection')
+            + PageContent.objects.filter(is_page).exclude(page_type='page').update(page_type='page')
+        )
+        # update() sends no post_save, so invalidate cached content here
+        if updated_count:
+            bump_content_version()
         
-        for page in all_pages:
-            old_type = page.page_type
-            
-            # Determine page type based on URL
-            if '/products/' in page.url:
-                page.page_type = 'product'
-                product_count += 1
-            elif '/collections/' in page.url:
-                page.page_type = 'collection'
-                collection_count += 1
-            else:
-                page.page_type = 'page'
-                page_count += 1
-            
-            # Save if changed
-            if old_type != page.page_type:
-                page.save()
-                updated_count += 1
+        stats = PageContent.objects.aggregate(
+            total=Count('pk'),
+            products=Count('pk', filter=Q(page_type='product')),
+            collections=Count('pk', filter=Q(page_type='collection')),
+            pages=Count('pk', filter=Q(page_type='page')),
+        )
         
         self.stdout.write("="*60)
         self.stdout.write(
             self.style.SUCCESS(f"✅ Fixed {updated_count} pages!")
         )
         self.stdout.write(f"\n📊 Final Stats:")
-        self.stdout.write(f"📦 Products: {product_count}")
-        self.stdout.write(f"📁 Collections: {collection_count}")
-        self.stdout.write(f"📄 Other Pages: {page_count}")
-        self.stdout.write(f"📊 Total: {total}")
-        self.stdout.write("="*60)
\ No newline at end of file
+        self.stdout.write(f"📦 Products: {stats['products']}")
+        self.stdout.write(f"📁 Collections: {stats['collections']}")
+        self.stdout.write(f"📄 Other Pages: {stats['pages']}")
+        self.stdout.write(f"📊 Total: {stats['total']}")
+        self.stdout.write("="*60)
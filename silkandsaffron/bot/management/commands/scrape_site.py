@@ -10,6 +10,7 @@
 #         self.stdout.write(self.style.SUCCESS(f"Scraped {len(visited)} pages from {domain}"))
 
 from django.core.management.base import BaseCommand
+from bot.caching import bump_content_version
 from bot.web_scrap import scrape_all_pages
 from bot.models import PageContent
 
@@ -47,6 +48,7 @@ class Command(BaseCommand):
         if clear:
             count = PageContent.objects.count()
             PageContent.objects.all().delete()
+            bump_content_version()
             self.stdout.write(
                 self.style.WARNING(f"🗑️ Deleted {count} existing pages")
             )
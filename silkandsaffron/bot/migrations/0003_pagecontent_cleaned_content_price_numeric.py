@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-15 08:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0002_alter_pagecontent_options_pagecontent_is_active_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pagecontent',
+            name='cleaned_content',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='pagecontent',
+            name='price_numeric',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-15 08:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0003_pagecontent_cleaned_content_price_numeric'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pagecontent',
+            name='price_numeric',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, max_digits=10, null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-15 08:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0004_pagecontent_price_numeric_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pagecontent',
+            name='is_active',
+            field=models.BooleanField(db_index=True, default=True),
+        ),
+        migrations.AlterField(
+            model_name='pagecontent',
+            name='page_type',
+            field=models.CharField(blank=True, db_index=True, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='pagecontent',
+            index=models.Index(fields=['is_active', 'page_type'], name='pc_active_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagecontent',
+            index=models.Index(fields=['page_type', 'price_numeric'], name='pc_type_price_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-15 08:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0005_pagecontent_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pagecontent',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=32),
+        ),
+    ]
@@ -1,5 +1,9 @@
+import hashlib
+
 from django.db import models
 
+from .text_utils import extract_price, extract_product_info
+
 class PageContent(models.Model):
     url = models.URLField(max_length=500, unique=True)
     page = models.CharField(max_length=200, blank=True)
@@ -8,13 +12,44 @@ class PageContent(models.Model):
     last_scraped = models.DateTimeField(auto_now=True)
     
     # ✅ NEW: Additional metadata
-    page_type = models.CharField(max_length=50, blank=True)  # 'product', 'collection', 'page'
-    is_active = models.BooleanField(default=True)
+    page_type = models.CharField(max_length=50, blank=True, db_index=True)  # 'product', 'collection', 'page'
+    is_active = models.BooleanField(default=True, db_index=True)
+    
+    # Derived from content on save, so the webhook never re-cleans text per request
+    cleaned_content = models.TextField(blank=True)
+    price_numeric = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, db_index=True)
+    content_hash = models.CharField(max_length=32, blank=True, db_index=True)  # lets rescrapes skip unchanged rows
     
     class Meta:
         ordering = ['-last_scraped']
         verbose_name = "Page Content"
         verbose_name_plural = "Page Contents"
+        indexes = [
+            models.Index(fields=['is_active', 'page_type'], name='pc_active_type_idx'),
+            models.Index(fields=['page_type', 'price_numeric'], name='pc_type_price_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.title or self.url}"
\ No newline at end of file
+        return f"{self.title or self.url}"
+    
+    DERIVED_FIELDS = ('cleaned_content', 'price_numeric', 'content_hash')
+    DERIVED_SOURCE_FIELDS = {'content', 'title', 'page_type'}
+    
+    def refresh_derived_fields(self):
+        """Recompute cleaned_content, price_numeric and content_hash from the raw content"""
+        self.cleaned_content = extract_product_info(self.content, self.title)
+        self.price_numeric = extract_price(self.content)
+        self.content_hash = hashlib.blake2b(
+            f"{self.page_type}\n{self.title}\n{self.content}".encode(), digest_size=16
+        ).hexdigest()
+    
+    def save(self, *args, **kwargs):
+        self.refresh_derived_fields()
+        
+        # update_or_create() and save(update_fields=...) only write the listed
+        # columns, so carry the derived ones along when their sources change
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & self.DERIVED_SOURCE_FIELDS:
+            kwargs['update_fields'] = {*update_fields, *self.DERIVED_FIELDS}
+        
+        super().save(*args, **kwargs)
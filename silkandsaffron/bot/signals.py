@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .caching import bump_content_version
+from .models import PageContent
+
+
+# No post_delete receiver: it would turn off Django's fast bulk delete and cost
+# cache writes per row, so delete paths bump the version once themselves
+@receiver(post_save, sender=PageContent)
+def invalidate_page_content_cache(sender, **kwargs):
+    bump_content_version()
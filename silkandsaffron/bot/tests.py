@@ -1,3 +1,610 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import caching, views, web_scrap
+from .models import PageContent
+from .text_utils import extract_price
+
+SHOP = "https://shop.test"
+
+
+def make_page(slug, title, content, page_type='product', **fields):
+    return PageContent.objects.create(
+        url=f"{SHOP}/products/{slug}", title=title, content=content, page_type=page_type, **fields
+    )
+
+
+class FixPageTypesTests(TestCase):
+    def test_classifies_by_url_and_counts_only_changed_rows(self):
+        for path, page_type in [
+            ('/products/red-dress', ''),
+            ('/products/blue-suit', 'product'),
+            ('/collections/sale', 'product'),
+            ('/collections/sale/products/kurta', 'collection'),
+            ('/pages/about', 'collection'),
+            ('/', 'page'),
+        ]:
+            PageContent.objects.create(url=SHOP + path, content='x', page_type=page_type)
+        out = StringIO()
+
+        call_command('fix_page_types', stdout=out)
+
+        self.assertEqual(
+            dict(PageContent.objects.values_list('url', 'page_type')),
+            {
+                SHOP + '/products/red-dress': 'product',
+                SHOP + '/products/blue-suit': 'product',
+                SHOP + '/collections/sale': 'collection',
+                SHOP + '/collections/sale/products/kurta': 'product',
+                SHOP + '/pages/about': 'page',
+                SHOP + '/': 'page',
+            },
+        )
+        self.assertIn('Fixed 4 pages', out.getvalue())
+        self.assertIn('Products: 3', out.getvalue())
+        self.assertIn('Total: 6', out.getvalue())
+
+
+class PageContentSaveTests(TestCase):
+    def test_update_or_create_writes_derived_fields(self):
+        make_page('a', 'A', 'Product: A')
+        PageContent.objects.update_or_create(
+            url=f"{SHOP}/products/a",
+            defaults={'content': 'Product: A\n\nPrice: Rs.2,500.00\n\nA lovely silk dress for evening wear.'},
+        )
+
+        page = PageContent.objects.get(url=f"{SHOP}/products/a")
+        self.assertEqual(page.price_numeric, 2500)
+        self.assertIn('lovely silk dress', page.cleaned_content)
+        self.assertEqual(len(page.content_hash), 32)
+
+    def test_save_with_update_fields_keeps_derived_fields_in_sync(self):
+        page = make_page('a', 'A', 'Product: A\n\nPrice: Rs.100')
+        page.content = 'Product: A\n\nPrice: Rs.300'
+        page.save(update_fields=['content'])
+
+        self.assertEqual(PageContent.objects.get(pk=page.pk).price_numeric, 300)
+
+    def test_extract_price(self):
+        self.assertEqual(extract_price('Price: Rs.1,200.50 | Rs.1500.00'), Decimal('1200.50'))
+        self.assertIsNone(extract_price('Price on request'))
+
+
+class ContentVersionTests(TestCase):
+    def later(self, seconds):
+        """Move the (database) cache's expiry clock forward"""
+        return mock.patch(
+            'django.core.cache.backends.db.tz_now', return_value=timezone.now() + timedelta(seconds=seconds)
+        )
+
+    def test_bumped_version_never_expires(self):
+        caching.content_version()
+        caching.bump_content_version()
+        version = cache.get(caching.CONTENT_VERSION_KEY)
+
+        with self.later(30 * 24 * 3600):
+            self.assertEqual(cache.get(caching.CONTENT_VERSION_KEY), version)
+
+    def test_bump_always_changes_the_version(self):
+        before = caching.content_version()
+        with mock.patch.object(caching.time, 'time_ns', return_value=before):
+            caching.bump_content_version()
+
+        self.assertNotEqual(caching.content_version(), before)
+
+    def test_page_changes_invalidate_scraped_content(self):
+        old = make_page('old', 'Old', 'Product: Old\n\nA discontinued lawn kurta from last summer.')
+        cache.clear()  # cold cache, as after a deploy
+        self.assertIn('Old', views.get_scraped_content())
+
+        old.is_active = False
+        old.save()
+        make_page('new', 'New', 'Product: New\n\nA fresh chiffon suit for the festive season.')
+
+        # Past the default cache timeout, the version must not fall back to an old key
+        with self.later(301):
+            corpus = views.get_scraped_content()
+        self.assertIn('New', corpus)
+        self.assertNotIn('Old', corpus)
+
+
+class PageContentDeleteTests(TestCase):
+    def setUp(self):
+        for i in range(50):
+            make_page(f'p{i}', f'P{i}', 'Product')
+
+    def test_bulk_delete_stays_a_single_query(self):
+        with self.assertNumQueries(1):
+            PageContent.objects.all().delete()
+
+    def test_admin_deletes_invalidate_cached_content(self):
+        model_admin = admin.site._registry[PageContent]
+
+        before = caching.content_version()
+        model_admin.delete_queryset(None, PageContent.objects.filter(url__endswith='/p1'))
+        after_bulk = caching.content_version()
+        model_admin.delete_model(None, PageContent.objects.get(url__endswith='/p2'))
+
+        self.assertNotEqual(after_bulk, before)
+        self.assertNotEqual(caching.content_version(), after_bulk)
+        self.assertEqual(PageContent.objects.count(), 48)
+
+
+class PriceQueryTests(TestCase):
+    def setUp(self):
+        make_page('suit', 'Silk Suit', 'Product: Silk Suit\n\nPrice: Rs.4,000.00')
+        make_page('kurta', 'Lawn Kurta', 'Product: Lawn Kurta\n\nPrice: Rs.1,200.00')
+        make_page('old', 'Old Kurta', 'Product: Old Kurta\n\nPrice: Rs.900.00', is_active=False)
+        make_page('sale', 'Sale', 'Collection: Sale\n\nPrice: Rs.100.00', page_type='collection')
+
+    def test_cheap_query_lists_active_products_cheapest_first(self):
+        response, score, title = views.search_in_scraped_content("sasta kurta", "english", "price")
+
+        self.assertEqual((score, title), (0.95, "Price Comparison"))
+        self.assertLess(response.index('Lawn Kurta - Rs.1200'), response.index('Silk Suit - Rs.4000'))
+        self.assertNotIn('Old Kurta', response)
+        self.assertNotIn('Sale', response)
+
+    def test_expensive_query_lists_priciest_first(self):
+        response, _, _ = views.handle_price_query("mehnga suit", "urdu")
+
+        self.assertTrue(response.startswith("🌟 Premium options"))
+        self.assertLess(response.index('Silk Suit'), response.index('Lawn Kurta'))
+
+
+class SearchScoringTests(TestCase):
+    def search(self, query):
+        return views.search_in_scraped_content(query, "english", "test-" + query.replace(" ", "-"))
+
+    def test_phrase_in_content(self):
+        make_page('red', 'Red Dress', 'A lovely red silk dress for evening wear and parties.')
+
+        excerpt, score, title = self.search("evening wear")
+
+        self.assertEqual(score, 0.9)
+        self.assertEqual(title, 'Red Dress')
+        self.assertIn('evening wear', excerpt)
+
+    def test_phrase_in_title(self):
+        make_page('edit', 'Festive Edit', 'Embroidered outfits picked for the wedding season.')
+
+        self.assertEqual(self.search("festive edit")[1:], (0.85, 'Festive Edit'))
+
+    def test_color_and_category(self):
+        make_page('gown', 'Evening Gown', 'A lovely red silk dress for evening wear and parties.')
+
+        self.assertEqual(self.search("red dress")[1:], (0.8, 'Evening Gown'))
+
+    def test_color_or_category_only(self):
+        make_page('pink', 'Pink Kurta', 'A soft pink cotton kurta for everyday summer wear.')
+
+        self.assertEqual(self.search("pink dress")[1:], (0.6, 'Pink Kurta'))
+
+    def test_keyword_share_of_query_words(self):
+        make_page('edit', 'Wedding Edit', 'Embroidered festive outfits picked for the wedding season.')
+
+        _, score, _ = self.search("embroidered festive lehenga")
+
+        self.assertAlmostEqual(score, 2 / 3)
+
+    def test_repeated_query_words_count_once(self):
+        make_page('shawl', 'Silk Shawl', 'A warm woven silk shawl for chilly winter evenings.')
+
+        self.assertEqual(self.search("silk silk")[1], 1.0)
+
+    def test_weak_keyword_match_is_rejected(self):
+        make_page('shawl', 'Silk Shawl', 'A warm woven silk shawl for chilly winter evenings.')
+
+        self.assertEqual(self.search("silk lehenga gharara"), (None, 0, None))
+
+    def test_best_match_survives_the_candidate_limit(self):
+        for i in range(views.SEARCH_CANDIDATE_LIMIT + 5):
+            make_page(f'kurta{i}', f'Kurta {i}', 'A breezy cotton kurta with printed borders for daily wear.')
+        make_page('eid', 'Eid Kurta', 'A breezy cotton kurta with mirror work for eid wear.')
+
+        self.assertEqual(self.search("cotton kurta mirror")[1:], (1.0, 'Eid Kurta'))
+
+
+class RecentSuggestionTests(TestCase):
+    def test_suggested_page_is_not_repeated_in_the_same_session(self):
+        make_page('red', 'Red Dress', 'A lovely red silk dress for evening wear and parties.')
+
+        first = views.search_in_scraped_content("evening wear", "english", "repeat")
+        second = views.search_in_scraped_content("evening wear", "english", "repeat")
+        other_session = views.search_in_scraped_content("evening wear", "english", "other")
+
+        self.assertEqual(first[2], 'Red Dress')
+        self.assertEqual(second, (None, 0, None))
+        self.assertEqual(other_session[2], 'Red Dress')
+
+    def test_history_keeps_only_the_latest_urls(self):
+        caching.set_last_suggested("s", [f"{SHOP}/products/p{i}" for i in range(15)])
+
+        history = caching.get_last_suggested("s")
+
+        self.assertEqual(len(history), caching.LAST_SUGGESTED_LIMIT)
+        self.assertEqual(history[-1], f"{SHOP}/products/p14")
+        self.assertEqual(history[0], f"{SHOP}/products/p5")
+
+
+class FallbackIntentTests(TestCase):
+    def test_greetings_answer_without_queries(self):
+        for query in ["hi", "hii", "Hello there", "heyy", "Assalam o alaikum",
+                      "assalamualaikum", "Asalam-o-Alaikum", "salam"]:
+            with self.subTest(query=query), self.assertNumQueries(0):
+                self.assertTrue(views.handle_fallback_intent(query, "english", "s").startswith("Hello!"))
+
+    def test_small_talk(self):
+        cases = {
+            "thanks a lot": "You're welcome!",
+            "shukriya": "You're welcome!",
+            "what is your name": "I'm Silk and Saffron's assistant.",
+            "ok bye": "Goodbye!",
+        }
+        for query, reply in cases.items():
+            with self.subTest(query=query):
+                self.assertTrue(views.handle_fallback_intent(query, "english", "s").startswith(reply))
+
+    def test_greeting_inside_a_word_does_not_match(self):
+        make_page('shirt', 'White Shirt', 'Product: White Shirt\n\nPrice: Rs.1,500.00')
+
+        response = views.handle_fallback_intent("show me this white shirt", "english", "s")
+
+        self.assertIn("• White Shirt - Rs.1500", response)
+
+
+class DetectLanguageTests(TestCase):
+    def test_roman_urdu_words_and_urdu_script(self):
+        for text in ["mujhe red dress dikhao", "Kya yeh available hai?", "آپ کیسے ہیں"]:
+            with self.subTest(text=text):
+                self.assertEqual(views.detect_language(text), "urdu")
+
+    def test_urdu_words_only_match_whole_words(self):
+        for text in ["show me a kitchen apron", "I need this in white", "happy hour"]:
+            with self.subTest(text=text):
+                self.assertEqual(views.detect_language(text), "english")
+
+
+class IterShopifyProductsTests(TestCase):
+    def crawl(self, catalogue_size, limit=None):
+        page_size = web_scrap.PRODUCTS_PAGE_SIZE
+
+        def fake_page(products_url, page):
+            first = (page - 1) * page_size
+            return [{'id': i} for i in range(first, min(first + page_size, catalogue_size))]
+
+        with mock.patch.object(web_scrap, 'fetch_products_page', side_effect=fake_page) as fetch:
+            products = list(web_scrap.iter_shopify_products(SHOP, limit))
+        return products, sorted(call.args[1] for call in fetch.call_args_list)
+
+    def test_single_page_catalogue_is_one_request(self):
+        products, pages = self.crawl(97)
+
+        self.assertEqual(len(products), 97)
+        self.assertEqual(pages, [1])
+
+    def test_limit_caps_the_pages_requested(self):
+        products, pages = self.crawl(5000, limit=300)
+
+        self.assertEqual(pages, [1, 2])
+        self.assertEqual([p['id'] for p in products], list(range(500)))
+
+    def test_full_pages_are_followed_until_a_short_one(self):
+        products, pages = self.crawl(2 * web_scrap.PRODUCTS_PAGE_SIZE + 3)
+
+        self.assertEqual(len(products), 2 * web_scrap.PRODUCTS_PAGE_SIZE + 3)
+        self.assertEqual(pages[:3], [1, 2, 3])
+        self.assertLessEqual(len(pages), 1 + web_scrap.PAGE_WINDOW)
+
+
+class BuildRowTests(TestCase):
+    def description(self, body_html):
+        row = web_scrap.build_product_row({'title': 'Red Dress', 'handle': 'red', 'body_html': body_html}, SHOP)
+        parts = row.content.split('\n\nDescription: ')
+        return parts[1] if len(parts) > 1 else None
+
+    def test_tags_are_stripped_and_entities_decoded(self):
+        self.assertEqual(self.description('<p>Silk &amp; chiffon, <b>hand&#8209;embroidered</b></p>'),
+                         'Silk & chiffon, hand\u2011embroidered')
+
+    def test_description_is_capped(self):
+        description = self.description('<p>' + 'x' * 1000 + '</p>')
+
+        self.assertEqual(description, 'x' * web_scrap.DESCRIPTION_LENGTH)
+
+    def test_only_the_scan_window_of_body_html_is_read(self):
+        # Text past the window is never reached, however much markup precedes it
+        markup = '<span class="a-very-long-attribute">x</span>' * 100
+
+        self.assertNotIn('TAIL', self.description(markup + 'TAIL'))
+
+    def test_tag_cut_by_the_window_is_dropped(self):
+        # Markup up to just short of the window, so it ends inside the <img> tag
+        padding = '<br>' * ((web_scrap.DESCRIPTION_SCAN_CHARS - 20) // 4)
+        body_html = padding + 'text <img src="a-long-image-url.jpg">'
+
+        self.assertEqual(self.description(body_html), 'text')
+
+    def test_missing_or_empty_body_html(self):
+        for body_html in [None, '', '<p></p>']:
+            with self.subTest(body_html=body_html):
+                self.assertIsNone(self.description(body_html))
+
+    def test_collection_description_is_decoded_in_full(self):
+        body_html = '<p>Co&#8209;ords &amp; sets</p>' + '<p>' + 'z' * 3000 + '</p>'
+
+        row = web_scrap.build_collection_row({'title': 'Sets', 'handle': 'sets', 'body_html': body_html}, SHOP)
+
+        self.assertEqual(row.url, f"{SHOP}/collections/sets")
+        self.assertEqual(row.content, 'Collection: Sets\n\nDescription: Co\u2011ords & sets' + 'z' * 3000)
+
+
+class UpsertRowsTests(TestCase):
+    def row(self, slug, content):
+        return web_scrap.make_page_row(f"{SHOP}/products/{slug}", slug.title(), content, 'product')
+
+    def age(self, slug):
+        """Push last_scraped into the past so a rewrite is visible"""
+        old = timezone.now() - timedelta(days=1)
+        PageContent.objects.filter(url=f"{SHOP}/products/{slug}").update(last_scraped=old)
+        return old
+
+    def stored(self, slug):
+        return PageContent.objects.get(url=f"{SHOP}/products/{slug}")
+
+    def test_new_rows_are_created_and_counted(self):
+        counts = web_scrap.upsert_rows([self.row('a', 'Product: A'), self.row('b', 'Product: B')])
+
+        self.assertEqual(counts, (2, 0))
+        self.assertEqual(self.stored('b').content_hash, self.row('b', 'Product: B').content_hash)
+
+    def test_duplicate_urls_in_a_batch_are_written_once(self):
+        counts = web_scrap.upsert_rows([self.row('a', 'Product: A'), self.row('a', 'Product: A v2')])
+
+        self.assertEqual(counts, (1, 0))
+        self.assertEqual(self.stored('a').content, 'Product: A v2')
+
+    def test_changed_row_is_updated_with_fresh_last_scraped(self):
+        web_scrap.upsert_rows([self.row('a', 'Product: A\n\nPrice: Rs.100')])
+        old = self.age('a')
+
+        counts = web_scrap.upsert_rows([self.row('a', 'Product: A\n\nPrice: Rs.150')])
+
+        page = self.stored('a')
+        self.assertEqual(counts, (0, 1))
+        self.assertEqual(page.content, 'Product: A\n\nPrice: Rs.150')
+        self.assertEqual(page.price_numeric, 150)
+        self.assertGreater(page.last_scraped, old)
+
+    def test_unchanged_row_is_skipped(self):
+        web_scrap.upsert_rows([self.row('a', 'Product: A')])
+        old = self.age('a')
+
+        version = caching.content_version()
+
+        counts = web_scrap.upsert_rows([self.row('a', 'Product: A')])
+
+        self.assertEqual(counts, (0, 0))
+        self.assertEqual(self.stored('a').last_scraped, old)
+        self.assertEqual(caching.content_version(), version)
+
+    def test_unchanged_inactive_row_is_reactivated(self):
+        web_scrap.upsert_rows([self.row('a', 'Product: A')])
+        PageContent.objects.filter(url=f"{SHOP}/products/a").update(is_active=False)
+        old = self.age('a')
+
+        counts = web_scrap.upsert_rows([self.row('a', 'Product: A')])
+
+        page = self.stored('a')
+        self.assertEqual(counts, (0, 1))
+        self.assertTrue(page.is_active)
+        self.assertGreater(page.last_scraped, old)
+
+
+class ScrapeAllPagesTests(TestCase):
+    PRODUCTS = [
+        {'title': 'Red Dress', 'handle': 'red', 'variants': [{'title': 'S', 'price': '4500.00'}]},
+        {'title': 'Blue Set', 'handle': 'blue', 'variants': [{'title': 'M', 'price': '6000.00'}]},
+    ]
+    COLLECTIONS = [{'title': 'Dresses', 'handle': 'dresses', 'body_html': '<p>All dresses</p>'}]
+
+    def scrape(self, products=PRODUCTS):
+        with mock.patch.object(web_scrap, 'iter_shopify_products', return_value=iter(products)), \
+                mock.patch.object(web_scrap, 'scrape_shopify_collections', return_value=self.COLLECTIONS), \
+                self.assertLogs('bot', level='INFO') as logs:
+            web_scrap.scrape_all_pages(SHOP)
+        return [line for line in logs.output if '📊' in line]
+
+    def test_summary_counts_new_rows(self):
+        self.assertEqual(self.scrape(), [
+            'INFO:bot.web_scrap:📊 Total items processed: 4',
+            'INFO:bot.web_scrap:📊 New items added: 4',
+            'INFO:bot.web_scrap:📊 Updated items: 0',
+            'INFO:bot.web_scrap:📊 Skipped items: 0',
+        ])
+        self.assertEqual(PageContent.objects.get(url=SHOP).page_type, 'page')
+
+    def test_unchanged_rescrape_writes_nothing(self):
+        self.scrape()
+        version = caching.content_version()
+        old = timezone.now() - timedelta(days=1)
+        PageContent.objects.update(last_scraped=old)
+
+        summary = self.scrape()
+
+        self.assertEqual(summary[1:], [
+            'INFO:bot.web_scrap:📊 New items added: 0',
+            'INFO:bot.web_scrap:📊 Updated items: 0',
+            'INFO:bot.web_scrap:📊 Skipped items: 4',
+        ])
+        self.assertFalse(PageContent.objects.exclude(last_scraped=old).exists())
+        self.assertEqual(caching.content_version(), version)
+
+    def test_changed_product_is_counted_as_updated(self):
+        self.scrape()
+        changed = [dict(self.PRODUCTS[0], title='Red Dress (Sale)'), self.PRODUCTS[1]]
+
+        self.assertEqual(self.scrape(changed)[1:3], [
+            'INFO:bot.web_scrap:📊 New items added: 0',
+            'INFO:bot.web_scrap:📊 Updated items: 1',
+        ])
+
+
+
+class FormatScrapedResponseTests(TestCase):
+    def test_templates_by_language_and_title(self):
+        self.assertEqual(
+            views.format_scraped_response("  Soft lawn kurta.  ", "q", "english", "Lawn Kurta"),
+            "✨ **Lawn Kurta**\n\nSoft lawn kurta.\n\nWant more details?",
+        )
+        self.assertEqual(
+            views.format_scraped_response("Soft lawn kurta.", "q", "urdu", "Lawn Kurta"),
+            "✨ **Lawn Kurta**\n\nSoft lawn kurta.\n\n💬 Aur details chahiye?",
+        )
+        self.assertEqual(
+            views.format_scraped_response("Soft lawn kurta.", "q", "english", "Product"),
+            "Soft lawn kurta.\n\nNeed more info?",
+        )
+        self.assertEqual(
+            views.format_scraped_response("Soft lawn kurta.", "q", "urdu"),
+            "Soft lawn kurta.\n\n💬 Kya aur janana chahein?",
+        )
+
+    def test_long_excerpt_is_cut_at_the_last_sentence(self):
+        excerpt = "A" * 150 + ". " + "B" * 200
+
+        body = views.format_scraped_response(excerpt, "q", "english").split("\n\n")[0]
+
+        self.assertEqual(body, "A" * 150 + ".")
+
+    def test_long_excerpt_without_early_sentence_end_gets_ellipsis(self):
+        excerpt = "A" * 50 + ". " + "B" * 400
+
+        body = views.format_scraped_response(excerpt, "q", "english").split("\n\n")[0]
+
+        self.assertEqual(len(body), 303)
+        self.assertTrue(body.endswith("B..."))
+
+
+class WebhookResponseTests(TestCase):
+    def test_reply_is_orjson_bytes_in_dialogflow_shape(self):
+        response = self.client.post(
+            '/webhook/',
+            data={"queryResult": {"queryText": "thanks", "intent": {"displayName": "Default Fallback Intent"}}},
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content), {
+            "fulfillmentText": "You're welcome! Anything else I can help with? 😊",
+            "fulfillmentMessages": [{"text": {"text": ["You're welcome! Anything else I can help with? 😊"]}}],
+            "source": "webhook",
+        })
+
+    def test_get_is_rejected(self):
+        response = self.client.get('/webhook/')
+
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(json.loads(response.content), {"error": "Only POST allowed"})
+
+    def test_health_reports_pages_and_cache(self):
+        make_page('a', 'A', 'Product: A\n\nA lovely silk dress for evening wear.')
+
+        data = json.loads(self.client.get('/webhook/health/').content)
+
+        self.assertEqual((data["status"], data["scraped_pages"], data["cache_status"]), ("healthy", 1, "empty"))
+
+
+class WebhookRequestTests(TestCase):
+    def post(self, body):
+        return self.client.post('/webhook/', data=body, content_type='application/json')
+
+    def fulfillment(self, response):
+        return json.loads(response.content)["fulfillmentText"]
+
+    def test_malformed_json_is_a_400(self):
+        for body in [b'{"queryResult": ', b'not json', b'[1, 2]']:
+            with self.subTest(body=body):
+                response = self.post(body)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(self.fulfillment(response), "⚠️ Invalid request.")
+
+    def test_null_or_missing_sections_are_tolerated(self):
+        for body in [
+            {"session": None, "queryResult": {"queryText": "hello"}},
+            {"queryResult": {"queryText": "hello", "intent": None}},
+            {"queryResult": None},
+            {},
+        ]:
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body).status_code, 200)
+
+    def test_session_id_is_taken_from_the_session_path(self):
+        make_page('red', 'Red Dress', 'A lovely red silk dress for evening wear and parties.')
+        body = {
+            "session": "projects/shop/agent/sessions/abc123",
+            "queryResult": {"queryText": "evening wear", "intent": {"displayName": "LLMQueryIntent"}},
+        }
+
+        self.assertIn("Red Dress", self.fulfillment(self.post(body)))
+        self.assertEqual(list(caching.get_last_suggested("abc123")), [f"{SHOP}/products/red"])
+
+    def test_language_is_detected_from_the_query(self):
+        body = {"queryResult": {"queryText": "assalam o alaikum, kya haal hai"}}
+
+        self.assertTrue(self.fulfillment(self.post(body)).startswith("Salam!"))
+
+
+class FakeStream:
+    """Stands in for a streamed Gemini response, one SSE event per chunk"""
+    status_code = 200
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_lines(self):
+        for chunk in self.chunks:
+            event = {"candidates": [{"content": {"parts": [{"text": chunk}]}}]}
+            yield b"data: " + json.dumps(event).encode()
+
+
+@override_settings(GEMINI_API_KEY="test-key")
+class GenerateWithGeminiTests(TestCase):
+    def generate(self, chunks, max_sentences):
+        with mock.patch.object(views.GEMINI_SESSION, 'post', return_value=FakeStream(chunks)):
+            return views.generate_with_gemini("prompt", temperature=0.5, max_output_tokens=100, max_sentences=max_sentences)
+
+    def test_stops_after_max_sentences(self):
+        self.assertEqual(self.generate(["One. Two! Thr", "ee? Four."], 3), "One. Two! Three?")
+
+    def test_list_markers_are_not_sentence_ends(self):
+        reply = "Yeh options dekhein:\n1. Audra Dress (Rs. 3099)\n2. Glow Kurta (Rs. 2500)\n10. Silk Suit"
+
+        self.assertEqual(self.generate([reply[:40], reply[40:]], 3), reply)
+
+    def test_currency_abbreviation_is_not_a_sentence_end(self):
+        self.assertEqual(
+            self.generate(["Try the Audra dress for Rs. 3,099.", " It is lovely. Want more? Yes."], 2),
+            "Try the Audra dress for Rs. 3,099. It is lovely.",
+        )
+
+    def test_words_ending_in_rs_and_numbers_end_sentences(self):
+        self.assertEqual(self.generate(["We have many colors. Want one? Yes."], 2), "We have many colors. Want one?")
+        self.assertEqual(self.generate(["Track your orders. Flowers. Done."], 2), "Track your orders. Flowers.")
+        self.assertEqual(self.generate(["Take size 12. It fits well. Thanks."], 2), "Take size 12. It fits well.")
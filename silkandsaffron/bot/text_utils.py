@@ -0,0 +1,89 @@
+import re
+from decimal import Decimal, InvalidOperation
+
+
+# Navigation/footer noise removed from scraped text, matched in a single pass
+_NOISE_RE = re.compile(
+    '|'.join(f'(?:{pattern})' for pattern in [
+        r'skip to content',
+        r'your cart is empty',
+        r'continue shopping',
+        r'have an account\?',
+        r'log in to check out',
+        r'estimated total',
+        r'taxes.*calculated at checkout',
+        r'check out',
+        r'loading\.\.\.',
+        r'add to cart',
+        r'view cart',
+        r'home.*clearance sale',  # Navigation menu
+        r'co-ord sets.*elegant floral',  # Menu items
+        r'cart.*loading',
+        r'Rs \d+\.\d+',  # Prices without context
+    ]),
+    re.IGNORECASE,
+)
+_WHITESPACE_RE = re.compile(r'\s+')
+_PUNCT_ONLY_RE = re.compile(r'^[^\w\s]+$')
+
+
+def clean_scraped_text(text):
+    """
+    ✅ CLEAN scraped content - remove navigation, HTML artifacts
+    """
+    if not text:
+        return ""
+    
+    cleaned = _NOISE_RE.sub('', text)
+    
+    # Collapse whitespace (newlines included)
+    cleaned = _WHITESPACE_RE.sub(' ', cleaned).strip()
+    
+    # Drop fragments that are too short or only special characters
+    if len(cleaned) <= 10 or _PUNCT_ONLY_RE.match(cleaned):
+        return ""
+    
+    return cleaned
+
+
+def extract_product_info(text, title=""):
+    """
+    ✅ Extract meaningful product information only
+    """
+    cleaned = clean_scraped_text(text)
+    
+    # Look for product descriptions (usually longer sentences)
+    sentences = cleaned.split('.')
+    product_sentences = []
+    
+    for sent in sentences:
+        sent = sent.strip()
+        # Keep sentences that are descriptive (5-100 words)
+        word_count = len(sent.split())
+        if 5 <= word_count <= 100:
+            # Skip if it's just navigation/menu items
+            if not any(nav in sent.lower() for nav in ['home', 'cart', 'checkout', 'log in', 'sign up']):
+                product_sentences.append(sent)
+    
+    # Take first 2-3 meaningful sentences
+    if product_sentences:
+        result = '. '.join(product_sentences[:3])
+        return result + '.' if result else cleaned[:300]
+    
+    # Fallback to first 300 chars of cleaned text
+    return cleaned[:300]
+
+
+# First "Rs.1,234.00"-style amount in product content
+_PRICE_RE = re.compile(r'Rs\.?(\d+(?:,\d{3})*(?:\.\d{2})?)')
+
+
+def extract_price(text):
+    """Return the first Rs. price in text as a Decimal, or None"""
+    price_match = _PRICE_RE.search(text or "")
+    if not price_match:
+        return None
+    try:
+        return Decimal(price_match.group(1).replace(',', ''))
+    except InvalidOperation:
+        return None
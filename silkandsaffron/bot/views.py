@@ -1,198 +1,198 @@
+import atexit
 import os
 import json
 import re
+import orjson
 import requests
-import difflib
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import concurrent.futures
 import random
-from django.http import JsonResponse
+from django.db.models import Case, F, Q, Value, When
+from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.core.cache import cache
+from bot.caching import (
+    SCRAPED_CONTENT_TIMEOUT, content_version, get_last_suggested,
+    scraped_content_key, set_last_suggested,
+)
 from bot.models import PageContent
 from django.conf import settings
 
-# --- Caching Setup ---
-PAGES_CACHE = None
-SCRAPED_CONTENT_CACHE = None
-LAST_SUGGESTED_PRODUCTS = []
-
-
-def clean_scraped_text(text):
-    """
-    ✅ CLEAN scraped content - remove navigation, HTML artifacts
-    """
-    if not text:
-        return ""
-    
-    # Remove common navigation/footer text
-    noise_patterns = [
-        r'skip to content',
-        r'your cart is empty',
-        r'continue shopping',
-        r'have an account\?',
-        r'log in to check out',
-        r'estimated total',
-        r'taxes.*calculated at checkout',
-        r'check out',
-        r'loading\.\.\.',
-        r'add to cart',
-        r'view cart',
-        r'home.*clearance sale',  # Navigation menu
-        r'co-ord sets.*elegant floral',  # Menu items
-        r'cart.*loading',
-        r'Rs \d+\.\d+',  # Prices without context
-    ]
-    
-    cleaned = text
-    for pattern in noise_patterns:
-        cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
-    
-    # Remove extra whitespace
-    cleaned = re.sub(r'\s+', ' ', cleaned)
-    cleaned = re.sub(r'\n+', '\n', cleaned)
-    
-    # Remove lines with only special characters
-    lines = [line.strip() for line in cleaned.split('\n') if line.strip()]
-    meaningful_lines = [
-        line for line in lines 
-        if len(line) > 10 and not re.match(r'^[^\w\s]+$', line)
-    ]
-    
-    return ' '.join(meaningful_lines).strip()
-
-
-def extract_product_info(text, title=""):
-    """
-    ✅ Extract meaningful product information only
-    """
-    cleaned = clean_scraped_text(text)
-    
-    # Look for product descriptions (usually longer sentences)
-    sentences = cleaned.split('.')
-    product_sentences = []
-    
-    for sent in sentences:
-        sent = sent.strip()
-        # Keep sentences that are descriptive (5-100 words)
-        word_count = len(sent.split())
-        if 5 <= word_count <= 100:
-            # Skip if it's just navigation/menu items
-            if not any(nav in sent.lower() for nav in ['home', 'cart', 'checkout', 'log in', 'sign up']):
-                product_sentences.append(sent)
-    
-    # Take first 2-3 meaningful sentences
-    if product_sentences:
-        result = '. '.join(product_sentences[:3])
-        return result + '.' if result else cleaned[:300]
+# --- Search ---
+# Pages scored in Python after the database has ranked the candidates
+SEARCH_CANDIDATE_LIMIT = 10
+PHRASE_IN_CONTENT = 2
+PHRASE_IN_TITLE = 1
+
+# --- Keyword matching ---
+# Each vocabulary is one compiled alternation, so a query is classified in a single scan
+_URDU_SCRIPT_RE = re.compile(r"[\u0600-\u06FF]")
+_URDU_WORDS_RE = re.compile(
+    r"\b(?:mujhe|kaun|kon|kaha|dikhao|dikho|kya|kaise|batao|chahiye|hai|ki|ap|aap)\b", re.IGNORECASE
+)
+_PRICE_RE = re.compile(r"\b(?:sasta|cheap|mehnga|expensive|price|budget)")
+_CHEAP_RE = re.compile(r"\b(?:sasta|cheap|budget|affordable)")
+_COLOR_RE = re.compile(r"\b(?:red|blue|green|black|white|pink|yellow|purple)")
+_CATEGORY_RE = re.compile(r"\b(?:dress|saree|suit|kurta|shirt|pant|dupatta)")
+# Greeting words need boundaries ("hi" is inside "shirt"), but the salam family
+# ("assalam o alaikum", "asalam-o-alaikum", "assalamualaikum") is matched anywhere
+_GREETING_RE = re.compile(r"\b(?:hel+o+|hi+|hey+)\b|sa+la+m")
+_THANKS_RE = re.compile(r"\b(?:thanks|thank you|shukriya|thankyou)\b")
+_NAME_RE = re.compile(r"\b(?:naam|name|kaun|who)\b")
+_BYE_RE = re.compile(r"\b(?:bye|khuda hafiz|goodbye)\b")
+
+# A sentence ends at . ! or ? followed by whitespace. A mark at the very end of the
+# streamed text is not counted until the next chunk shows what follows it, and
+# neither the currency abbreviation ("Rs. 3,099") nor a list marker at the
+# start of a line ("1. Audra Dress") ends a sentence
+_SENTENCE_END_RE = re.compile(r"(?<!\b[Rr]s)(?<!^\d)(?<!^\d\d)[.!?]\s", re.MULTILINE)
+
+# --- Outbound HTTP ---
+# One keep-alive session so Gemini calls skip the TCP/TLS handshake
+GEMINI_SESSION = requests.Session()
+GEMINI_SESSION.headers.update({"Content-Type": "application/json"})
+GEMINI_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=32,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504),
+                      allowed_methods=None, raise_on_status=False),
+))
+
+# Shared worker pool for outbound calls: threads are started once per process and
+# total outbound concurrency stays bounded no matter how many requests arrive
+OUTBOUND_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=16, thread_name_prefix="webhook")
+atexit.register(OUTBOUND_EXECUTOR.shutdown, wait=False)
+
+# Wall-clock budget for a whole streamed Gemini reply (socket timeouts only bound each read)
+GEMINI_DEADLINE = 10
+
+
+def build_scraped_content():
+    """Combine the latest scraped pages into a single prompt context"""
+    rows = (
+        PageContent.objects.filter(is_active=True)
+        .order_by('-last_scraped')
+        .values_list('title', 'url', 'cleaned_content')[:20]
+    )
+    combined_content = "\n\n".join([
+        f"Page: {title or url}\nContent: {cleaned_content}"
+        for title, url, cleaned_content in rows
+    ])
     
-    # Fallback to first 300 chars of cleaned text
-    return cleaned[:300]
+    return combined_content[:3000]
 
 
 def get_scraped_content():
-    """Load all scraped content from database"""
-    global SCRAPED_CONTENT_CACHE
-    if SCRAPED_CONTENT_CACHE:
-        return SCRAPED_CONTENT_CACHE
-    
-    all_pages = PageContent.objects.all()
-    combined_content = "\n\n".join([
-        f"Page: {p.title or p.url}\nContent: {extract_product_info(p.content, p.title)}"
-        for p in all_pages[:20]
-    ])
-    
-    SCRAPED_CONTENT_CACHE = combined_content[:3000]
-    return SCRAPED_CONTENT_CACHE or "Website content not available"
+    """Load scraped content, cached until PageContent changes"""
+    combined_content = cache.get_or_set(scraped_content_key(), build_scraped_content, SCRAPED_CONTENT_TIMEOUT)
+    return combined_content or "Website content not available"
 
 
 def detect_language(text):
     """Detect if text is Urdu or English"""
-    if re.search(r"[\u0600-\u06FF]", text):
-        return "urdu"
-    
-    urdu_words = ["mujhe", "kaun", "kon", "kaha", "dikhao", "dikho",
-                  "kya", "kaise", "batao", "chahiye", "hai", "ki", "ap"]
-    if any(word in text.lower() for word in urdu_words):
+    if _URDU_SCRIPT_RE.search(text) or _URDU_WORDS_RE.search(text):
         return "urdu"
     
     return "english"
 
 
-def search_in_scraped_content(user_query, threshold=0.3):
+def build_search_filter(terms):
+    """Q object matching pages whose title or content contains any of the terms"""
+    condition = Q()
+    for term in dict.fromkeys(t for t in terms if t):
+        condition |= Q(title__icontains=term) | Q(cleaned_content__icontains=term)
+    return condition
+
+
+def count_term_hits(terms):
+    """SQL expression counting how many of the terms appear in a page's cleaned content"""
+    hits = Value(0)
+    for term in dict.fromkeys(terms):
+        hits += Case(When(cleaned_content__icontains=term, then=Value(1)), default=Value(0))
+    return hits
+
+
+def search_in_scraped_content(user_query, language, session_id, threshold=0.3):
     """
     ✅ IMPROVED: Better search with cleaned content + price queries
     """
-    global LAST_SUGGESTED_PRODUCTS
+    last_suggested = get_last_suggested(session_id)
     
     user_query_lower = user_query.lower()
     all_matches = []
     
      # ✅ NEW: Handle price queries first
-    price_keywords = ['sasta', 'cheap', 'mehnga', 'expensive', 'price', 'budget']
-    if any(word in user_query_lower for word in price_keywords):
-        return handle_price_query(user_query_lower)
+    if _PRICE_RE.search(user_query_lower):
+        return handle_price_query(user_query_lower, language)
     
-    # Extract key terms
-    query_words = [w for w in user_query_lower.split() if len(w) > 2]
+    # Extract key terms (deduped, so the keyword score divides by distinct words)
+    query_words = list(dict.fromkeys(w for w in user_query_lower.split() if len(w) > 2))
     
     # ✅ Add color/category detection
-    colors = ['red', 'blue', 'green', 'black', 'white', 'pink', 'yellow', 'purple']
-    categories = ['dress', 'saree', 'suit', 'kurta', 'shirt', 'pant', 'dupatta']
-    
-    query_colors = [c for c in colors if c in user_query_lower]
-    query_categories = [c for c in categories if c in user_query_lower]
-    
-    all_pages = PageContent.objects.all()
-    
-    for page in all_pages:
-        content_lower = page.content.lower()
-        title_lower = (page.title or "").lower()
+    query_colors = list(dict.fromkeys(_COLOR_RE.findall(user_query_lower)))
+    query_categories = list(dict.fromkeys(_CATEGORY_RE.findall(user_query_lower)))
+
+    # Let the database discard pages that share no term with the query
+    search_terms = [user_query_lower, *query_words, *query_colors, *query_categories]
+    candidates = PageContent.objects.filter(build_search_filter(search_terms), is_active=True)
+
+    # "red dress": pages mentioning both a color and a category outrank the rest
+    if query_colors and query_categories:
+        both = candidates.filter(build_search_filter(query_colors)).filter(build_search_filter(query_categories))
+        if both.exists():
+            candidates = both
+
+    # Match signals and rank are computed in SQL; Python only scores the top rows
+    candidates = (
+        candidates.exclude(url__in=list(last_suggested))
+        .annotate(
+            phrase_match=Case(
+                When(cleaned_content__icontains=user_query_lower, then=Value(PHRASE_IN_CONTENT)),
+                When(title__icontains=user_query_lower, then=Value(PHRASE_IN_TITLE)),
+                default=Value(0),
+            ),
+            color_hits=count_term_hits(query_colors),
+            category_hits=count_term_hits(query_categories),
+            word_hits=count_term_hits(query_words),
+        )
+        .annotate(rank=F('phrase_match') * 10 + F('color_hits') + F('category_hits') + F('word_hits'))
+        .order_by('-rank')
+        .only('url', 'title', 'cleaned_content')[:SEARCH_CANDIDATE_LIMIT]
+    )
+    
+    for page in candidates:
         score = 0
-        excerpt = ""
-        
-        # Clean content first
-        clean_content = extract_product_info(page.content, page.title)
-        clean_content_lower = clean_content.lower()
         
         # 1. ✅ EXACT PHRASE in cleaned content
-        if user_query_lower in clean_content_lower:
+        if page.phrase_match == PHRASE_IN_CONTENT:
             score = 0.9
-            excerpt = clean_content
             
         # 2. ✅ EXACT PHRASE in Title
-        elif user_query_lower in title_lower:
+        elif page.phrase_match == PHRASE_IN_TITLE:
             score = 0.85
-            excerpt = clean_content
         
         # 3. ✅ COLOR + CATEGORY match (e.g., "red dress")
         elif query_colors and query_categories:
-            color_match = any(c in clean_content_lower for c in query_colors)
-            category_match = any(c in clean_content_lower for c in query_categories)
-            
-            if color_match and category_match:
+            if page.color_hits and page.category_hits:
                 score = 0.8
-                excerpt = clean_content
-            elif color_match or category_match:
+            elif page.color_hits or page.category_hits:
                 score = 0.6
-                excerpt = clean_content
         
         # 4. ✅ KEYWORD MATCHING
         elif query_words:
-            matches = sum(1 for word in query_words if word in clean_content_lower)
-            score = matches / len(query_words)
-            
-            if score > 0.4:
-                excerpt = clean_content
+            keyword_score = page.word_hits / len(query_words)
+            if keyword_score > 0.4:
+                score = keyword_score
         
         # Store matches
-        if score >= threshold and excerpt:
-            page_id = page.url
-            if page_id not in LAST_SUGGESTED_PRODUCTS:
-                all_matches.append({
-                    'page': page,
-                    'score': score,
-                    'excerpt': excerpt,
-                    'title': page.title or "Product"
-                })
+        if score >= threshold and page.cleaned_content:
+            all_matches.append({
+                'page': page,
+                'score': score,
+                'excerpt': page.cleaned_content,
+                'title': page.title or "Product"
+            })
     
     # Return best match
     if all_matches:
@@ -205,55 +205,94 @@ def search_in_scraped_content(user_query, threshold=0.3):
             selected = random.choice(top_matches)
         
         # Update tracking
-        LAST_SUGGESTED_PRODUCTS.append(selected['page'].url)
-        if len(LAST_SUGGESTED_PRODUCTS) > 10:
-            LAST_SUGGESTED_PRODUCTS.pop(0)
+        last_suggested.append(selected['page'].url)
+        set_last_suggested(session_id, last_suggested)
         
         return selected['excerpt'], selected['score'], selected['title']
     
     return None, 0, None
 
 
+# Scraped-answer layouts keyed by (language, has_title)
+_RESPONSE_TEMPLATES = {
+    ("urdu", True): "✨ **{title}**\n\n{body}\n\n💬 Aur details chahiye?",
+    ("urdu", False): "{body}\n\n💬 Kya aur janana chahein?",
+    ("english", True): "✨ **{title}**\n\n{body}\n\nWant more details?",
+    ("english", False): "{body}\n\nNeed more info?",
+}
+
+
 def format_scraped_response(excerpt, query, language, title=""):
-    # """
-    # ✅ Format scraped content into SHORT natural response
-    # """
+    """
+    ✅ Format scraped content into SHORT natural response
+    """
     excerpt_clean = excerpt.strip()
     
-    # Limit to 200 chars for concise response
+    # Trim long excerpts to 300 chars, ending on a full sentence when possible
     if len(excerpt_clean) > 300:
-        # Take first 200 chars and find last complete sentence
         excerpt_clean = excerpt_clean[:300]
         last_period = excerpt_clean.rfind('.')
         if last_period > 100:
             excerpt_clean = excerpt_clean[:last_period + 1]
         else:
-            excerpt_clean = excerpt_clean[:300] + "..."
+            excerpt_clean += "..."
     
-    # Format based on language
-    if language == "urdu":
-        if title and title.lower() != "product":
-            response = f"✨ **{title}**\n\n{excerpt_clean}\n\n💬 Aur details chahiye?"
-        else:
-            response = f"{excerpt_clean}\n\n💬 Kya aur janana chahein?"
-    else:
-        if title and title.lower() != "product":
-            response = f"✨ **{title}**\n\n{excerpt_clean}\n\nWant more details?"
-        else:
-            response = f"{excerpt_clean}\n\nNeed more info?"
+    has_title = bool(title) and title.lower() != "product"
+    template = _RESPONSE_TEMPLATES["urdu" if language == "urdu" else "english", has_title]
+    return template.format(title=title, body=excerpt_clean)
+
+
+def generate_with_gemini(prompt, temperature, max_output_tokens, max_sentences=None):
+    """
+    Stream a Gemini reply over the pooled session, stopping early once
+    max_sentences complete sentences have arrived
+    """
+    GEMINI_API_KEY = getattr(settings, "GEMINI_API_KEY", None)
+    if not GEMINI_API_KEY:
+        return "⚠️ Configuration issue."
+
+    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
     
-    return response
+    payload = {
+        "contents": [{"parts": [{"text": prompt}]}],
+        "generationConfig": {
+            "temperature": temperature,
+            "maxOutputTokens": max_output_tokens,
+        }
+    }
+
+    text = ""
+    with GEMINI_SESSION.post(url, json=payload, stream=True, timeout=(2, 8)) as response:
+        if response.status_code != 200:
+            return f"⚠️ Error: {response.status_code}"
+        
+        # Server-sent events: one "data: {json}" line per generated chunk
+        for line in response.iter_lines():
+            if not line.startswith(b"data: "):
+                continue
+            chunk = json.loads(line[6:])
+            for candidate in chunk.get("candidates", [])[:1]:
+                for part in candidate.get("content", {}).get("parts", []):
+                    text += part.get("text", "")
+            
+            if max_sentences:
+                sentence_ends = list(_SENTENCE_END_RE.finditer(text))
+                if len(sentence_ends) >= max_sentences:
+                    # Drop the partial sentence that arrived with the last chunk
+                    text = text[:sentence_ends[max_sentences - 1].end()]
+                    break
+    
+    text = text.strip()
+    return text.replace("**", "").replace("*", "")
 
 
-def query_gemini_for_alternative(user_query, no_exact_match=False):
+def query_gemini_for_alternative(user_query, language, session_id, no_exact_match=False):
     """
     ✅ Gemini for ALTERNATIVE suggestions when exact match not found
     """
     try:
-        language = detect_language(user_query)
-        
         # Get diverse products
-        diverse_pages = get_diverse_product_samples(limit=5)
+        diverse_pages = get_diverse_product_samples(session_id, limit=5)
         
         if not diverse_pages:
             return "Sorry, no products available right now."
@@ -261,8 +300,7 @@ def query_gemini_for_alternative(user_query, no_exact_match=False):
         # Build clean product list
         product_list = []
         for p in diverse_pages:
-            clean_info = extract_product_info(p.content, p.title)
-            product_list.append(f"- {p.title}: {clean_info[:100]}")
+            product_list.append(f"- {p['title']}: {p['cleaned_content'][:100]}")
         
         products_text = "\n".join(product_list)
         
@@ -289,42 +327,19 @@ Available Products:
 Reply:
 """
 
-        GEMINI_API_KEY = getattr(settings, "GEMINI_API_KEY", None)
-        if not GEMINI_API_KEY:
-            return "⚠️ Configuration issue."
-
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:generateContent?key={GEMINI_API_KEY}"
-        
-        payload = {
-            "contents": [{"parts": [{"text": prompt}]}],
-            "generationConfig": {
-                "temperature": 0.8,
-                "maxOutputTokens": 200,
-            }
-        }
-
-        response = requests.post(url, headers={"Content-Type": "application/json"}, 
-                                json=payload, timeout=8)
-        
-        if response.status_code == 200:
-            data = response.json()
-            text = data["candidates"][0]["content"]["parts"][0]["text"].strip()
-            return text.replace("**", "").replace("*", "")
-        else:
-            return f"⚠️ Error: {response.status_code}"
+        future = OUTBOUND_EXECUTOR.submit(generate_with_gemini, prompt, temperature=0.8, max_output_tokens=200, max_sentences=3)
+        return future.result(timeout=GEMINI_DEADLINE)
         
     except Exception as e:
         print(f"❌ Gemini Error: {str(e)}")
         return "⚠️ Server busy. Please try again."
 
 
-def query_gemini_for_fallback(user_query, website_content):
+def query_gemini_for_fallback(user_query, language, website_content):
     """
     ✅ Gemini for general chat/greetings
     """
     try:
-        language = detect_language(user_query)
-        
         prompt = f"""
             You are a friendly sales assistant for silkandsaffron.store (Pakistani clothing store).
 
@@ -341,61 +356,38 @@ def query_gemini_for_fallback(user_query, website_content):
             Reply:
             """
 
-        GEMINI_API_KEY = getattr(settings, "GEMINI_API_KEY", None)
-        if not GEMINI_API_KEY:
-            return "⚠️ Configuration issue."
-
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:generateContent?key={GEMINI_API_KEY}"
-        
-        payload = {
-            "contents": [{"parts": [{"text": prompt}]}],
-            "generationConfig": {
-                "temperature": 0.9,
-                "maxOutputTokens": 150,
-            }
-        }
-
-        response = requests.post(url, headers={"Content-Type": "application/json"}, 
-                                json=payload, timeout=8)
-        
-        if response.status_code == 200:
-            data = response.json()
-            text = data["candidates"][0]["content"]["parts"][0]["text"].strip()
-            return text.replace("**", "").replace("*", "")
-        else:
-            return f"⚠️ Error: {response.status_code}"
+        future = OUTBOUND_EXECUTOR.submit(generate_with_gemini, prompt, temperature=0.9, max_output_tokens=150, max_sentences=2)
+        return future.result(timeout=GEMINI_DEADLINE)
         
     except Exception as e:
         print(f"❌ Gemini Error: {str(e)}")
         return "⚠️ Server busy. Please try again."
 
 
-def get_diverse_product_samples(limit=10):
+def get_diverse_product_samples(session_id, limit=10):
     """Get diverse random products"""
-    global LAST_SUGGESTED_PRODUCTS
+    recently_suggested = get_last_suggested(session_id)
+    
+    all_pages = PageContent.objects.filter(is_active=True).values('url', 'title', 'cleaned_content', 'price_numeric')
     
-    all_pages = PageContent.objects.all()
-    available_pages = [p for p in all_pages if p.url not in LAST_SUGGESTED_PRODUCTS]
+    # Sample in SQL (ORDER BY RANDOM() LIMIT n) instead of loading every row
+    available_pages = list(all_pages.exclude(url__in=list(recently_suggested)).order_by('?')[:limit])
     
     if not available_pages:
-        available_pages = list(all_pages)
-        LAST_SUGGESTED_PRODUCTS.clear()
+        available_pages = list(all_pages.order_by('?')[:limit])
+        set_last_suggested(session_id, [])
     
-    if len(available_pages) > limit:
-        return random.sample(list(available_pages), limit)
     return available_pages
 
 
-def handle_llm_query_intent(user_query):
+def handle_llm_query_intent(user_query, language, session_id):
     """
     ✅ LLMQueryIntent Handler with alternative suggestions
     """
     print(f"🎯 LLMQueryIntent triggered for: {user_query}")
     
     # Search in scraped content
-    scraped_excerpt, confidence, title = search_in_scraped_content(user_query, threshold=0.3)
-    
-    language = detect_language(user_query)
+    scraped_excerpt, confidence, title = search_in_scraped_content(user_query, language, session_id, threshold=0.3)
     
     # ✅ HIGH CONFIDENCE: Return scraped DIRECTLY
     if scraped_excerpt and confidence > 0.7:
@@ -410,14 +402,14 @@ def handle_llm_query_intent(user_query):
     # ❌ LOW/NO MATCH: Give alternatives
     else:
         print(f"❌ LOW confidence - Using direct alternatives")
-        #return query_gemini_for_alternative(user_query, no_exact_match=True)
-        return get_direct_alternatives(user_query, language)
+        #return query_gemini_for_alternative(user_query, language, session_id, no_exact_match=True)
+        return get_direct_alternatives(user_query, language, session_id)
 
-def get_direct_alternatives(user_query, language):
+def get_direct_alternatives(user_query, language, session_id):
     """
     Provide alternatives WITHOUT calling Gemini API
     """
-    products = get_diverse_product_samples(limit=5)
+    products = get_diverse_product_samples(session_id, limit=5)
     
     if not products:
         if language == "urdu":
@@ -428,12 +420,9 @@ def get_direct_alternatives(user_query, language):
     # Build response
     suggestions = []
     for p in products[:3]:
-        title = p.title or "Product"
-        price_match = re.search(r'Price:\s*([^\n]+)', p.content)
-        price = price_match.group(1) if price_match else ""
-        
-        if price:
-            suggestions.append(f"• {title} - {price}")
+        title = p['title'] or "Product"
+        if p['price_numeric'] is not None:
+            suggestions.append(f"• {title} - Rs.{int(p['price_numeric'])}")
         else:
             suggestions.append(f"• {title}")
     
@@ -454,58 +443,41 @@ Which one would you like to know more about? 😊"""
     
     return response
 
-def handle_price_query(query_lower):
+def handle_price_query(query_lower, language):
     """
     Handle price-based queries (cheapest/expensive)
     """
-    language = detect_language(query_lower)
-    
-    # Get all products with prices
-    all_products = PageContent.objects.filter(page_type='product')
-    
-    products_with_price = []
-    
-    for product in all_products:
-        # Extract price from content
-        price_match = re.search(r'Rs\.?(\d+(?:,\d{3})*(?:\.\d{2})?)', product.content)
-        if price_match:
-            try:
-                price_str = price_match.group(1).replace(',', '')
-                price = float(price_str)
-                products_with_price.append({
-                    'title': product.title,
-                    'price': price,
-                    'content': product.content[:300]
-                })
-            except:
-                continue
-    
-    if not products_with_price:
-        return None, 0, None
+    # Let the database sort by the precomputed price column
+    products_with_price = PageContent.objects.filter(
+        page_type='product', is_active=True, price_numeric__isnull=False
+    )
     
     # Check if looking for cheap or expensive
-    if any(word in query_lower for word in ['sasta', 'cheap', 'budget', 'affordable']):
-        # Sort by price (ascending)
-        products_with_price.sort(key=lambda x: x['price'])
-        selected_products = products_with_price[:3]
+    if _CHEAP_RE.search(query_lower):
+        ordering = 'price_numeric'
         
         if language == "urdu":
             response = "🌟 Sabse saste options:\n\n"
         else:
             response = "🌟 Most affordable options:\n\n"
     else:
-        # Sort by price (descending)  
-        products_with_price.sort(key=lambda x: x['price'], reverse=True)
-        selected_products = products_with_price[:3]
+        ordering = '-price_numeric'
         
         if language == "urdu":
             response = "🌟 Premium options:\n\n"
         else:
             response = "🌟 Premium options:\n\n"
     
+    selected_products = list(
+        products_with_price.order_by(ordering).values_list('title', 'price_numeric')[:3]
+    )
+    
+    if not selected_products:
+        return None, 0, None
+    
     # Build response
-    for i, p in enumerate(selected_products, 1):
-        response += f"{i}. {p['title']} - Rs.{int(p['price'])}\n"
+    for i, (title, price) in enumerate(selected_products, 1):
+        response += f"{i}. {title} - Rs.{int(price)}\n"
     
     if language == "urdu":
         response += "\nKaunsa dekhna chahein? 😊"
@@ -525,47 +497,61 @@ def handle_price_query(query_lower):
     
 #     return response
 
-def handle_fallback_intent(user_query):
+def handle_fallback_intent(user_query, language, session_id):
     """
     ✅ Fallback Intent - General chat WITHOUT Gemini
     """
     print(f"🔄 Fallback intent triggered for: {user_query}")
     
-    language = detect_language(user_query)
     query_lower = user_query.lower()
     
     # Simple pattern-based responses
     
     # Greetings
-    if any(word in query_lower for word in ['hello', 'hi', 'salam', 'hey']):
+    if _GREETING_RE.search(query_lower):
         if language == "urdu":
             return "Salam! Main aapki kaise madad kar sakti hoon? Aap apne pasand ka product puch sakte hain. 😊"
         else:
             return "Hello! How can I help you today? Feel free to ask about our products. 😊"
     
     # Thanks
-    if any(word in query_lower for word in ['thanks', 'thank you', 'shukriya', 'thankyou']):
+    if _THANKS_RE.search(query_lower):
         if language == "urdu":
             return "Khushi hui madad karke! Kuch aur chahiye? 😊"
         else:
             return "You're welcome! Anything else I can help with? 😊"
     
     # Name
-    if any(word in query_lower for word in ['naam', 'name', 'kaun', 'who']):
+    if _NAME_RE.search(query_lower):
         if language == "urdu":
             return "Main Silk and Saffron ki assistant hoon. Aap mujhse products ke baare mein puch sakte hain! 💫"
         else:
             return "I'm Silk and Saffron's assistant. Ask me about our products! 💫"
     
     # Bye
-    if any(word in query_lower for word in ['bye', 'khuda hafiz', 'goodbye']):
+    if _BYE_RE.search(query_lower):
         if language == "urdu":
             return "Khuda hafiz! Dobara zaroor aaiyega. 👋"
         else:
             return "Goodbye! Visit us again soon. 👋"
     
     # Default: Show random products
-    return get_direct_alternatives(user_query, language)
+    return get_direct_alternatives(user_query, language, session_id)
+
+
+# Shared read-only default for missing payload sections (never mutated)
+_EMPTY = {}
+
+
+def json_response(data, status=200):
+    """JSON HttpResponse serialized with orjson (much cheaper than JsonResponse's encoder)"""
+    return HttpResponse(orjson.dumps(data), content_type="application/json", status=status)
+
+
+INTENT_HANDLERS = {
+    "LLMQueryIntent": handle_llm_query_intent,
+    "Default Fallback Intent": handle_fallback_intent,
+}
 
 
 @csrf_exempt
@@ -575,32 +561,34 @@ def dialogflow_webhook(request):
     """
     if request.method == "POST":
         try:
-            body = json.loads(request.body.decode("utf-8"))
+            body = orjson.loads(request.body)
         except Exception as e:
             print(f"❌ Invalid JSON: {e}")
-            return JsonResponse({"fulfillmentText": "⚠️ Invalid request."}, status=400)
-
-        user_query = body.get("queryResult", {}).get("queryText", "")
-        intent = body.get("queryResult", {}).get("intent", {}).get("displayName", "")
+            return json_response({"fulfillmentText": "⚠️ Invalid request."}, status=400)
+        
+        if not isinstance(body, dict):
+            print("❌ Invalid JSON: payload is not an object")
+            return json_response({"fulfillmentText": "⚠️ Invalid request."}, status=400)
+
+        # Sections may be missing or null
+        query_result = body.get("queryResult") or _EMPTY
+        user_query = query_result.get("queryText") or ""
+        intent = (query_result.get("intent") or _EMPTY).get("displayName", "")
+        # "projects/<project>/agent/sessions/<session-id>" -> "<session-id>"
+        session_id = (body.get("session") or "").rsplit("/", 1)[-1]
+        language = detect_language(user_query)
         
         print(f"\n{'='*50}")
         print(f"📝 User Query: {user_query}")
         print(f"🎯 Intent Detected: {intent}")
         print(f"{'='*50}\n")
         
-        answer = None
-        
-        # Route based on intent
-        if intent == "LLMQueryIntent":
-            answer = handle_llm_query_intent(user_query)
-        elif intent == "Default Fallback Intent" or not intent:
-            answer = handle_fallback_intent(user_query)
-        else:
-            answer = handle_fallback_intent(user_query)
+        # Route based on intent (unknown intents fall back to general chat)
+        handler = INTENT_HANDLERS.get(intent, handle_fallback_intent)
+        answer = handler(user_query, language, session_id)
         
         # Safety check
         if not answer or len(answer.strip()) < 5:
-            language = detect_language(user_query)
             if language == "urdu":
                 answer = "Maaf kijiye! Kya aap apna sawal thoda detail mein puch sakte hain?"
             else:
@@ -608,13 +596,13 @@ def dialogflow_webhook(request):
         
         print(f"📤 Final Response: {answer}\n")
         
-        return JsonResponse({
+        return json_response({
             "fulfillmentText": answer,
             "fulfillmentMessages": [{"text": {"text": [answer]}}],
             "source": "webhook"
         })
 
-    return JsonResponse({"error": "Only POST allowed"}, status=405)
+    return json_response({"error": "Only POST allowed"}, status=405)
 
 
 def webhook_health(request):
@@ -624,15 +612,15 @@ def webhook_health(request):
     # Test content cleaning
     if scraped_count > 0:
         sample = PageContent.objects.first()
-        cleaned_sample = extract_product_info(sample.content, sample.title)
+        cleaned_sample = sample.cleaned_content
     else:
         cleaned_sample = "No data"
     
-    return JsonResponse({
+    return json_response({
         "status": "healthy",
         "scraped_pages": scraped_count,
-        "cache_status": "loaded" if SCRAPED_CONTENT_CACHE else "empty",
-        "last_suggested_count": len(LAST_SUGGESTED_PRODUCTS),
+        "cache_status": "loaded" if cache.get(scraped_content_key()) is not None else "empty",
+        "content_version": content_version(),
         "sample_cleaned_content": cleaned_sample[:200],
         "cleaning_enabled": True
     })
\ No newline at end of file
@@ -1,51 +1,164 @@
 # bot/web_scrap.py - SHOPIFY API VERSION (No Selenium needed!)
 
+import html
+import logging
+import re
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.db import transaction
+from django.utils import timezone
+from .caching import bump_content_version
 from .models import PageContent
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
 
+log = logging.getLogger(__name__)
 
-def scrape_shopify_products(domain):
+# products.json pages fetched concurrently per round
+PAGE_WINDOW = 8
+
+# Shopify's maximum products.json page size; a shorter page is the last one
+PRODUCTS_PAGE_SIZE = 250
+
+# Rows per INSERT / UPDATE statement, and the columns rewritten on existing rows
+UPSERT_BATCH_SIZE = 500
+UPSERT_FIELDS = [
+    'title', 'content', 'page_type', 'is_active',
+    'cleaned_content', 'price_numeric', 'content_hash', 'last_scraped',
+]
+
+# HTML tag stripper for Shopify body_html
+_TAG_RE = re.compile(r'<[^>]+>')
+
+# Product descriptions keep 500 chars of text; markup rarely inflates that
+# past 4x, so only this much of body_html is scanned
+DESCRIPTION_LENGTH = 500
+DESCRIPTION_SCAN_CHARS = 2000
+
+# Banner rule for the scrape's section headers
+SEPARATOR = "=" * 60
+
+# Slow down only once Shopify reports the API call bucket is this full
+THROTTLE_THRESHOLD = 0.8
+
+# One keep-alive session for the whole crawl, so each page reuses an open
+# connection instead of paying a fresh TCP + TLS handshake.
+# 429s honour Retry-After, other failures back off exponentially (capped at 30s)
+SHOPIFY_SESSION = requests.Session()
+SHOPIFY_SESSION.headers.update({
+    "User-Agent": "silkandsaffron-bot/1.0",
+    "Accept-Encoding": "gzip, deflate",
+})
+SHOPIFY_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=5, backoff_factor=0.3, backoff_max=30,
+                      status_forcelist=(429, 500, 502, 503, 504), raise_on_status=False),
+))
+
+
+def throttle_from_headers(response):
+    """
+    Sleep only when Shopify says we are close to its rate limit
+    (X-Shopify-Shop-Api-Call-Limit: "<used>/<bucket size>")
     """
-    Scrape products using Shopify's products.json API
+    call_limit = response.headers.get('X-Shopify-Shop-Api-Call-Limit', '')
+    try:
+        used, bucket = (int(n) for n in call_limit.split('/'))
+    except ValueError:
+        return
+    
+    if bucket and used > THROTTLE_THRESHOLD * bucket:
+        time.sleep((used / bucket) * 0.5)
+
+
+def fetch_products_page(products_url, page):
+    """
+    Fetch one page of products.json
+    Returns the page's products, or None if the request failed
+    """
+    try:
+        url = f"{products_url}?page={page}&limit={PRODUCTS_PAGE_SIZE}"
+        log.debug("   Page %s: %s", page, url)
+        
+        response = SHOPIFY_SESSION.get(url, timeout=10)
+        throttle_from_headers(response)
+        
+        if response.status_code != 200:
+            log.error("   ❌ Status %s", response.status_code)
+            return None
+        
+        data = orjson.loads(response.content)
+        return data.get('products', [])
+        
+    except Exception as e:
+        log.error("   ❌ Error: %s", e)
+        return None
+
+
+def iter_shopify_products(domain, limit=None):
+    """
+    Yield products from Shopify's products.json API
     This works for most Shopify stores without JavaScript rendering
+    
+    Page 1 is fetched on its own; only while pages keep coming back full are
+    further pages requested, PAGE_WINDOW at a time in parallel. The crawl
+    stops at the first short, empty or failed page, and never asks for pages
+    beyond what `limit` products need.
+    Products are yielded page by page, so only the current window is held
+    in memory rather than the whole catalogue
+    
+    Once a window's last page arrives full, the next window is requested
+    before that page is handed out, so those requests are in flight while
+    the caller writes to the database
     """
     base_url = domain.rstrip('/')
     products_url = f"{base_url}/products.json"
+    fetch_page = partial(fetch_products_page, products_url)
+    last_page = -(-limit // PRODUCTS_PAGE_SIZE) if limit else None
     
-    all_products = []
-    page = 1
+    log.info("🔍 Fetching products from Shopify API...")
     
-    print(f"🔍 Fetching products from Shopify API...")
+    executor = ThreadPoolExecutor(max_workers=PAGE_WINDOW)
     
-    while True:
-        try:
-            url = f"{products_url}?page={page}&limit=250"
-            print(f"   Page {page}: {url}")
-            
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                print(f"   ❌ Status {response.status_code}")
-                break
-            
-            data = response.json()
-            products = data.get('products', [])
-            
-            if not products:
-                break
-            
-            all_products.extend(products)
-            print(f"   ✅ Found {len(products)} products")
+    def submit_window(first_page, size):
+        stop = first_page + size
+        if last_page:
+            stop = min(stop, last_page + 1)
+        return [executor.submit(fetch_page, page) for page in range(first_page, stop)]
+    
+    try:
+        page = 1
+        window = submit_window(page, 1)
+        
+        while window:
+            page += len(window)
+            next_window = []
             
-            page += 1
-            time.sleep(0.5)  # Rate limiting
+            # Results are taken in page order, whichever request finishes first
+            for future in window:
+                products = future.result()
+                if not products:
+                    return
+                
+                page_full = len(products) >= PRODUCTS_PAGE_SIZE
+                if page_full and future is window[-1]:
+                    next_window = submit_window(page, PAGE_WINDOW)
+                
+                log.info("   ✅ Found %d products", len(products))
+                yield from products
+                
+                if not page_full:
+                    return
             
-        except Exception as e:
-            print(f"   ❌ Error: {str(e)}")
-            break
-    
-    return all_products
+            window = next_window
+    finally:
+        # Drop queued pages once the crawl ends or the caller stops early
+        executor.shutdown(wait=False, cancel_futures=True)
 
 
 def scrape_shopify_collections(domain):
@@ -56,39 +169,102 @@ def scrape_shopify_collections(domain):
     collections_url = f"{base_url}/collections.json"
     
     try:
-        print(f"🔍 Fetching collections from Shopify API...")
-        response = requests.get(collections_url, timeout=10)
+        log.info("🔍 Fetching collections from Shopify API...")
+        response = SHOPIFY_SESSION.get(collections_url, timeout=10)
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             collections = data.get('collections', [])
-            print(f"   ✅ Found {len(collections)} collections")
+            log.info("   ✅ Found %d collections", len(collections))
             return collections
         else:
-            print(f"   ⚠️ Collections API not available")
+            log.warning("   ⚠️ Collections API not available")
             return []
             
     except Exception as e:
-        print(f"   ❌ Error: {str(e)}")
+        log.error("   ❌ Error: %s", e)
         return []
 
 
-def save_product_to_db(product, domain):
+def make_page_row(url, title, content, page_type):
+    """Unsaved PageContent with its derived fields filled (bulk_create skips save())"""
+    row = PageContent(url=url, title=title, content=content, page_type=page_type, is_active=True)
+    row.refresh_derived_fields()
+    return row
+
+
+def upsert_rows(rows):
+    """
+    Insert-or-update rows by URL: one lookup of the stored rows, then one
+    batched INSERT for new URLs and one batched UPDATE for changed ones
+    Returns (created, updated); unchanged rows count as neither
+    
+    Each call is one transaction: a single commit per batch, and a failed
+    batch rolls back on its own without losing earlier batches
+    """
+    # One row per URL, otherwise a batch would try to update the same row twice
+    rows = list({row.url: row for row in rows}.values())
+    
+    try:
+        with transaction.atomic():
+            stored = {
+                url: (pk, content_hash, is_active)
+                for url, pk, content_hash, is_active in PageContent.objects
+                .filter(url__in=[row.url for row in rows])
+                .values_list('url', 'pk', 'content_hash', 'is_active')
+            }
+            
+            to_insert = []
+            to_update = []
+            now = timezone.now()
+            for row in rows:
+                if row.url not in stored:
+                    to_insert.append(row)
+                    continue
+                
+                pk, content_hash, is_active = stored[row.url]
+                # Skip rows whose stored content is identical (the common case on a rescrape)
+                if is_active and content_hash == row.content_hash:
+                    continue
+                row.pk = pk
+                row.last_scraped = now  # bulk_update does not apply auto_now
+                to_update.append(row)
+            
+            if not to_insert and not to_update:
+                return 0, 0
+            
+            PageContent.objects.bulk_create(to_insert, batch_size=UPSERT_BATCH_SIZE, ignore_conflicts=True)
+            PageContent.objects.bulk_update(to_update, UPSERT_FIELDS, batch_size=UPSERT_BATCH_SIZE)
+        
+        # bulk_create sends no post_save, so invalidate cached content here
+        bump_content_version()
+        return len(to_insert), len(to_update)
+        
+    except Exception as e:
+        log.error("   ❌ Error saving batch: %s", e)
+        return 0, 0
+
+
+def build_product_row(product, base_url):
     """
-    Save Shopify product to database
+    Build an unsaved PageContent row for a Shopify product
     """
     try:
         # Extract product info
         product_id = product.get('id')
         title = product.get('title', '')
         handle = product.get('handle', '')
-        url = f"{domain.rstrip('/')}/products/{handle}"
+        url = base_url + "/products/" + handle
         
         # Description
-        body_html = product.get('body_html', '')
-        # Remove HTML tags for clean text
-        import re
-        description = re.sub(r'<[^>]+>', '', body_html).strip()
+        body_html = product.get('body_html') or ''
+        snippet = body_html[:DESCRIPTION_SCAN_CHARS]
+        # Drop a tag cut in half by the slice, it would survive _TAG_RE
+        tag_start = snippet.rfind('<')
+        if tag_start > snippet.rfind('>'):
+            snippet = snippet[:tag_start]
+        # Remove HTML tags and decode entities (&amp; -> &) for clean text
+        description = html.unescape(_TAG_RE.sub('', snippet)).strip()
         
         # Variants (sizes, colors, etc.)
         variants = product.get('variants', [])
@@ -125,13 +301,13 @@ def save_product_to_db(product, domain):
         ]
         
         if prices:
-            unique_prices = list(set(prices))
+            unique_prices = list(dict.fromkeys(prices))
             content_parts.append(f"Price: {' | '.join(unique_prices[:2])}")
         
         content_parts.append(f"Status: {availability}")
         
         if variant_info:
-            unique_variants = list(set(variant_info))
+            unique_variants = list(dict.fromkeys(variant_info))
             content_parts.append(f"Options: {', '.join(unique_variants[:10])}")
         
         if product_type:
@@ -144,41 +320,29 @@ def save_product_to_db(product, domain):
             content_parts.append(f"Tags: {tags_str}")
         
         if description:
-            content_parts.append(f"Description: {description[:500]}")
+            content_parts.append(f"Description: {description[:DESCRIPTION_LENGTH]}")
         
         content = '\n\n'.join(content_parts)
         
-        # Save to database
-        obj, created = PageContent.objects.update_or_create(
-            url=url,
-            defaults={
-                'title': title,
-                'content': content,
-                'page_type': 'product',
-                'is_active': True
-            }
-        )
-        
-        return created
+        return make_page_row(url, title, content, 'product')
         
     except Exception as e:
-        print(f"   ❌ Error saving product: {str(e)}")
-        return False
+        log.error("   ❌ Error building product: %s", e)
+        return None
 
 
-def save_collection_to_db(collection, domain):
+def build_collection_row(collection, base_url):
     """
-    Save Shopify collection to database
+    Build an unsaved PageContent row for a Shopify collection
     """
     try:
         title = collection.get('title', '')
         handle = collection.get('handle', '')
-        url = f"{domain.rstrip('/')}/collections/{handle}"
+        url = base_url + "/collections/" + handle
         
         # Description
-        body_html = collection.get('body_html', '')
-        import re
-        description = re.sub(r'<[^>]+>', '', body_html).strip()
+        body_html = collection.get('body_html') or ''
+        description = html.unescape(_TAG_RE.sub('', body_html)).strip()
         
         # Build content
         content_parts = [
@@ -190,100 +354,114 @@ def save_collection_to_db(collection, domain):
         
         content = '\n\n'.join(content_parts)
         
-        # Save to database
-        obj, created = PageContent.objects.update_or_create(
-            url=url,
-            defaults={
-                'title': title,
-                'content': content,
-                'page_type': 'collection',
-                'is_active': True
-            }
-        )
-        
-        return created
+        return make_page_row(url, title, content, 'collection')
         
     except Exception as e:
-        print(f"   ❌ Error saving collection: {str(e)}")
-        return False
+        log.error("   ❌ Error building collection: %s", e)
+        return None
 
 
 def scrape_all_pages(domain, limit=100):
     """
     Main scraping function using Shopify API
     """
-    print(f"🚀 Starting Shopify API scrape of {domain}\n")
+    log.info("🚀 Starting Shopify API scrape of %s\n", domain)
+    
+    # Normalised once here; row builders append paths to it directly
+    base_url = domain.rstrip('/')
     
     scraped_count = 0
-    new_count = 0
+    created_count = 0
+    updated_count = 0
+    
+    def save(rows):
+        nonlocal created_count, updated_count
+        created, updated = upsert_rows(rows)
+        created_count += created
+        updated_count += updated
+    
+    # collections.json is independent of the product crawl, so fetch it in
+    # the background; all DB writes stay on this thread (SQLite has one writer)
+    background = ThreadPoolExecutor(max_workers=1)
+    collections_future = background.submit(scrape_shopify_collections, domain)
+    background.shutdown(wait=False)
     
     # Scrape products
-    print("="*60)
-    print("📦 SCRAPING PRODUCTS")
-    print("="*60)
+    log.info(SEPARATOR)
+    log.info("📦 SCRAPING PRODUCTS")
+    log.info(SEPARATOR)
     
-    products = scrape_shopify_products(domain)
+    # Rows are written in batches as pages arrive instead of after the whole crawl
+    products = islice(iter_shopify_products(domain, limit), limit)
+    product_count = 0
+    rows = []
     
-    if products:
-        print(f"\n💾 Saving {len(products)} products to database...")
-        for i, product in enumerate(products[:limit], 1):
-            title = product.get('title', 'Unknown')
-            print(f"   [{i}/{len(products[:limit])}] {title}")
-            
-            created = save_product_to_db(product, domain)
-            scraped_count += 1
-            if created:
-                new_count += 1
-            
-            # Rate limiting
-            if i % 10 == 0:
-                time.sleep(0.5)
+    for product_count, product in enumerate(products, 1):
+        title = product.get('title', 'Unknown')
+        log.debug("   [%d] %s", product_count, title)
+        
+        row = build_product_row(product, base_url)
+        scraped_count += 1
+        if row:
+            rows.append(row)
+        
+        if len(rows) >= UPSERT_BATCH_SIZE:
+            save(rows)
+            rows = []
+    
+    if rows:
+        save(rows)
+    
+    if product_count:
+        log.info("\n💾 Saved %d products to database", product_count)
     else:
-        print("⚠️ No products found via API")
+        log.warning("⚠️ No products found via API")
     
     # Scrape collections
-    print("\n" + "="*60)
-    print("📁 SCRAPING COLLECTIONS")
-    print("="*60)
+    log.info("\n%s", SEPARATOR)
+    log.info("📁 SCRAPING COLLECTIONS")
+    log.info(SEPARATOR)
     
-    collections = scrape_shopify_collections(domain)
+    collections = collections_future.result()
     
     if collections:
-        print(f"\n💾 Saving {len(collections)} collections to database...")
+        log.info("\n💾 Saving %d collections to database...", len(collections))
+        rows = []
         for i, collection in enumerate(collections, 1):
             title = collection.get('title', 'Unknown')
-            print(f"   [{i}/{len(collections)}] {title}")
+            log.debug("   [%d/%d] %s", i, len(collections), title)
             
-            created = save_collection_to_db(collection, domain)
+            row = build_collection_row(collection, base_url)
             scraped_count += 1
-            if created:
-                new_count += 1
+            if row:
+                rows.append(row)
+        
+        if rows:
+            save(rows)
     
     # Add homepage
-    print("\n" + "="*60)
-    print("🏠 ADDING HOMEPAGE")
-    print("="*60)
+    log.info("\n%s", SEPARATOR)
+    log.info("🏠 ADDING HOMEPAGE")
+    log.info(SEPARATOR)
     
-    try:
-        PageContent.objects.update_or_create(
-            url=domain,
-            defaults={
-                'title': 'Silk and Saffron - Home',
-                'content': 'Welcome to Silk and Saffron. Browse our collections of premium Pakistani clothing including co-ord sets, dresses, and more.',
-                'page_type': 'page',
-                'is_active': True
-            }
-        )
-        print("   ✅ Homepage added")
-        scraped_count += 1
-    except Exception as e:
-        print(f"   ❌ Error adding homepage: {e}")
+    # Same path as every other row, so an unchanged homepage is not rewritten
+    homepage = make_page_row(
+        domain,
+        'Silk and Saffron - Home',
+        'Welcome to Silk and Saffron. Browse our collections of premium Pakistani clothing including co-ord sets, dresses, and more.',
+        'page',
+    )
+    save([homepage])
+    scraped_count += 1
+    log.info("   ✅ Homepage added")
     
-    print("\n" + "="*60)
-    print(f"✅ SCRAPING COMPLETE")
-    print("="*60)
-    print(f"📊 Total items processed: {scraped_count}")
-    print(f"📊 New items added: {new_count}")
-    print(f"📊 Updated items: {scraped_count - new_count}")
+    log.info("\n%s", SEPARATOR)
+    log.info("✅ SCRAPING COMPLETE")
+    log.info(SEPARATOR)
+    log.info("📊 Total items processed: %d", scraped_count)
+    log.info("📊 New items added: %d", created_count)
+    log.info("📊 Updated items: %d", updated_count)
+    # Unchanged on this rescrape, or failed to build/save (logged above)
+    log.info("📊 Skipped items: %d", scraped_count - created_count - updated_count)
     
     return {domain}  # Return as set for compatibility
\ No newline at end of file